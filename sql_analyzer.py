@@ -1,27 +1,271 @@
 #!/usr/bin/env python3
 import argparse
+import hashlib
+import importlib.util
+import io
+import operator
+import re
 import sys
 import time
-from typing import List, Dict, Tuple, Any
+from enum import IntEnum
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple, Any, TypedDict
 
 try:
     import mysql.connector
     from mysql.connector import Error
+    from mysql.connector.constants import ClientFlag
+    from mysql.connector.pooling import MySQLConnectionPool
 except ImportError:
     print("Error: mysql-connector-python is not installed.")
     print("Install it using: pip install mysql-connector-python")
     sys.exit(1)
 
 try:
-    from rich.console import Console
-    from rich.table import Table
-    from rich.panel import Panel
-    from rich.text import Text
-    RICH_AVAILABLE = True
+    from orjson import loads as _json_loads
 except ImportError:
-    RICH_AVAILABLE = False
-    print("Warning: 'rich' library not found. Using plain text output.")
-    print("For better formatting, install it: pip install rich\n")
+    from json import loads as _json_loads
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+
+def _rich_available() -> bool:
+    # find_spec only probes the import machinery; the ~50-100 ms cost of
+    # actually importing rich is deferred until a rich report is rendered.
+    return importlib.util.find_spec('rich') is not None
+
+
+class ExplainRow(TypedDict, total=False):
+    """The tabular EXPLAIN columns the analysis actually reads.
+
+    Typing the row shape lets ahead-of-time compilers such as mypyc turn
+    the per-row dict traffic in the analysis loop into direct field
+    access; the module stays plain Python otherwise.
+    """
+    id: int
+    select_type: str
+    table: str
+    type: str
+    possible_keys: Optional[str]
+    key: Optional[str]
+    ref: Optional[str]
+    rows: int
+    Extra: Optional[str]
+
+
+# Matches all interesting EXPLAIN Extra markers in a single scan instead
+# of one substring search per marker.
+_EXTRA_RE = re.compile(r'Using (filesort|temporary|where)')
+
+# Access types where a NULL key is expected and shouldn't trigger the
+# missing-index finding on its own.
+_NO_KEY_OK_TYPES = frozenset({'ALL', 'index'})
+
+# Server-side duration (in ms) of the connection's most recent completed
+# statement; TIMER_WAIT is reported in picoseconds.
+_SERVER_TIME_SQL = (
+    "SELECT TIMER_WAIT / 1e9 "
+    "FROM performance_schema.events_statements_history "
+    "WHERE THREAD_ID = (SELECT THREAD_ID FROM performance_schema.threads "
+    "WHERE PROCESSLIST_ID = CONNECTION_ID()) "
+    "ORDER BY EVENT_ID DESC LIMIT 1"
+)
+
+class Problem(IntEnum):
+    FULL_SCAN = 1
+    NO_INDEX = 2
+    FILESORT = 3
+    TEMPORARY = 4
+    WHERE_NO_INDEX = 5
+    LARGE_SCAN = 6
+    JOIN_ORDER = 7
+
+
+# A finding is a problem code plus the fields needed to format its
+# messages; strings are only built when a report is rendered.
+Finding = Tuple[Problem, Dict[str, Any]]
+
+# (problem, suggestion) message pairs shared by the vectorized and
+# plain-Python analysis paths.
+_FINDING_TEMPLATES = {
+    Problem.FULL_SCAN: (
+        "Full Table Scan on table '{table}'",
+        "A full table scan was detected on table '{table}'. "
+        "Consider adding an index on the column(s) used in your WHERE or ON clauses."
+    ),
+    Problem.NO_INDEX: (
+        "No index used for table '{table}'",
+        "The query did not use an index for table '{table}'. "
+        "Review your WHERE clause and consider adding an appropriate index."
+    ),
+    Problem.FILESORT: (
+        "Using filesort for table '{table}'",
+        "The query is using a filesort operation on table '{table}'. "
+        "Consider adding an index on the column(s) in your ORDER BY clause."
+    ),
+    Problem.TEMPORARY: (
+        "Using temporary table for '{table}'",
+        "The query is creating a temporary table for '{table}'. "
+        "This is often caused by GROUP BY or UNION. Review your query logic or "
+        "ensure columns in GROUP BY are indexed."
+    ),
+    Problem.WHERE_NO_INDEX: (
+        "Unindexed WHERE clause on table '{table}'",
+        "The WHERE clause on table '{table}' is not using an index. "
+        "This will significantly slow down the query. Add an index on the filtered columns."
+    ),
+    Problem.LARGE_SCAN: (
+        "Large number of rows scanned ({rows:,}) on table '{table}'",
+        "Table '{table}' is scanning {rows:,} rows. "
+        "This indicates a potential performance bottleneck. "
+        "Consider adding more selective indexes or refining your WHERE conditions."
+    ),
+    Problem.JOIN_ORDER: (
+        "Potential suboptimal join order",
+        "The join reads tables in the order {observed}, but table "
+        "'{suggested_first}' is smaller and more connected in the join graph "
+        "than '{first}' ({first_rows:,} rows scanned). "
+        "Consider reordering your JOIN, e.g. {suggested}."
+    ),
+}
+
+
+def _flatten_json_plan(node: Any, markers: Tuple[str, ...] = ()) -> Iterator[ExplainRow]:
+    """Walk EXPLAIN FORMAT=JSON output and yield rows shaped like the
+    legacy tabular EXPLAIN, so the analysis checks apply unchanged.
+
+    Operation-level markers (filesort, temporary table) attach to the
+    first table underneath them, matching where tabular EXPLAIN reports
+    them in Extra.
+    """
+    if isinstance(node, list):
+        for item in node:
+            yield from _flatten_json_plan(item, markers)
+            markers = ()
+        return
+    if not isinstance(node, dict):
+        return
+
+    if node.get('using_filesort'):
+        markers += ('Using filesort',)
+    if node.get('using_temporary_table'):
+        markers += ('Using temporary',)
+
+    table = node.get('table')
+    if isinstance(table, dict) and 'table_name' in table:
+        extra = list(markers)
+        markers = ()
+        if 'attached_condition' in table:
+            extra.append('Using where')
+        if table.get('using_index'):
+            extra.append('Using index')
+        ref = table.get('ref')
+        yield {
+            'table': table['table_name'],
+            'type': table.get('access_type', ''),
+            'possible_keys': ', '.join(table.get('possible_keys') or []) or None,
+            'key': table.get('key'),
+            'ref': ', '.join(ref) if isinstance(ref, list) else ref,
+            'rows': table.get('rows_examined_per_scan', 0),
+            'Extra': '; '.join(extra),
+        }
+
+    for key, value in node.items():
+        if isinstance(value, (dict, list)):
+            yield from _flatten_json_plan(value, markers if key != 'table' else ())
+
+
+def _add_finding(findings: List[Finding], seen: set, code: Problem, **fields: Any):
+    # Dedupe on (code, table): the same table showing up in several
+    # EXPLAIN partitions used to produce identical messages repeatedly.
+    key = (code, fields.get('table'))
+    if key in seen:
+        return
+    seen.add(key)
+    findings.append((code, fields))
+
+
+def _check_join_order(join_info: List[Tuple[str, int, Any]],
+                      findings: List[Finding], seen: set):
+    # Greedy hub-score heuristic: build a join graph from EXPLAIN's ref
+    # column, score each table by its degree, and prefer starting the
+    # join from the most connected, smallest table. Catches far more
+    # suboptimal orders than the old "first table scans > 1000 rows"
+    # check.
+    order: List[str] = []
+    rows_by_table: Dict[str, int] = {}
+    degree: Dict[str, int] = {}
+
+    for table, rows_scanned, _ in join_info:
+        if table and table not in rows_by_table:
+            order.append(table)
+            rows_by_table[table] = rows_scanned
+            degree[table] = 0
+
+    if len(order) < 2:
+        return
+
+    for table, _, ref in join_info:
+        if not table or not ref:
+            continue
+        for part in str(ref).split(','):
+            bits = part.strip().split('.')
+            if len(bits) < 2:
+                continue  # 'const' and literal refs carry no join edge
+            other = bits[-2]
+            if other != table and other in degree:
+                degree[other] += 1
+                degree[table] += 1
+
+    suggested = sorted(order, key=lambda t: (-degree[t], rows_by_table[t]))
+    first, best = order[0], suggested[0]
+    if best != first and rows_by_table[first] > rows_by_table[best]:
+        _add_finding(findings, seen, Problem.JOIN_ORDER,
+                     first=first, first_rows=rows_by_table[first],
+                     suggested_first=best,
+                     observed=' -> '.join(order),
+                     suggested=' -> '.join(suggested))
+
+
+def _shape_explain(explain_plan: List[ExplainRow]) -> Tuple[List[str], List[Tuple[str, ...]]]:
+    # Project the plan into header names and per-row string tuples once;
+    # both report formatters consume the shaped data instead of each
+    # re-walking the raw dicts.
+    if not explain_plan:
+        return [], []
+    headers = list(explain_plan[0].keys())
+    # itemgetter fetches all cells of a row in one C-level call; rows
+    # missing a column (rare — plans from one cursor share their keys)
+    # are normalized first since itemgetter has no default.
+    get_cells = operator.itemgetter(*headers)
+    rows = []
+    for row in explain_plan:
+        try:
+            values = get_cells(row)
+        except KeyError:
+            values = get_cells({h: row.get(h) for h in headers})
+        if len(headers) == 1:
+            values = (values,)
+        rows.append(tuple('' if v is None else str(v) for v in values))
+    return headers, rows
+
+
+def _render_findings(findings: List[Finding]) -> Tuple[List[str], List[str]]:
+    problems: List[str] = []
+    suggestions: List[str] = []
+
+    for code, fields in findings:
+        problem, suggestion = _FINDING_TEMPLATES[code]
+        problems.append(problem.format(**fields))
+        suggestions.append(suggestion.format(**fields))
+
+    if not problems:
+        suggestions.append("No obvious performance issues detected. Query appears to be well-optimized.")
+
+    return problems, suggestions
 
 
 class SQLAnalyzer:
@@ -31,16 +275,37 @@ class SQLAnalyzer:
         self.password = password
         self.database = database
         self.connection = None
-        self.console = Console() if RICH_AVAILABLE else None
+        self._pool = None
+        # Rich output only makes sense on a terminal; when piped to a
+        # file the plain formatter is used and rich is never imported.
+        self._use_rich = sys.stdout.isatty() and _rich_available()
+        if sys.stdout.isatty() and not _rich_available():
+            print("Warning: 'rich' library not found. Using plain text output.")
+            print("For better formatting, install it: pip install rich\n")
+        # Prepared cursors keyed by query-text hash; lets repeated
+        # analyze() calls skip the server-side parse of the same query.
+        self._prep_cache: Dict[bytes, Any] = {}
 
     def connect(self) -> bool:
         try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database
-            )
+            # Pooled connections keep the TCP + auth handshake alive
+            # across connect()/close() cycles, which otherwise dominates
+            # the cost of analyzing a fast query against a remote server.
+            # The pool is filled eagerly at construction, so its size is
+            # the number of handshakes paid up front; one connection is
+            # enough to amortize across connect()/close() cycles for a
+            # single-query CLI process.
+            if self._pool is None:
+                self._pool = MySQLConnectionPool(
+                    pool_name='sql_analyzer',
+                    pool_size=1,
+                    host=self.host,
+                    user=self.user,
+                    password=self.password,
+                    database=self.database,
+                    client_flags=[ClientFlag.MULTI_STATEMENTS]
+                )
+            self.connection = self._pool.get_connection()
             return True
         except Error as e:
             print(f"Error connecting to MySQL database: {e}")
@@ -48,197 +313,316 @@ class SQLAnalyzer:
 
     def close(self):
         if self.connection and self.connection.is_connected():
+            # Prepared cursors are bound to this connection; drop them
+            # before the connection goes back to the pool.
+            for cursor in self._prep_cache.values():
+                cursor.close()
+            self._prep_cache.clear()
             self.connection.close()
 
+    def _server_execution_time_ms(self) -> Optional[float]:
+        # Ask performance_schema how long the server actually spent on
+        # the last statement; the wall-clock fallback includes network
+        # and client-side fetch cost, which drowns out fast queries.
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(_SERVER_TIME_SQL)
+            row = cursor.fetchone()
+            cursor.close()
+        except Error:
+            return None
+        if row and row[0] is not None:
+            return float(row[0])
+        return None
+
     def measure_execution_time(self, query: str) -> Tuple[float, int]:
-        cursor = self.connection.cursor()
+        cursor = self.connection.cursor(buffered=False)
 
         start_time = time.perf_counter()
         cursor.execute(query)
-        results = cursor.fetchall()
+        # Count rows by draining the unbuffered cursor instead of
+        # materializing the whole result set with fetchall(); peak memory
+        # stays flat no matter how many rows the query returns.
+        row_count = sum(1 for _ in cursor)
         end_time = time.perf_counter()
 
-        execution_time_ms = (end_time - start_time) * 1000
-        row_count = len(results)
-
         cursor.close()
+        server_ms = self._server_execution_time_ms()
+        execution_time_ms = server_ms if server_ms is not None else (end_time - start_time) * 1000
         return execution_time_ms, row_count
 
-    def get_explain_plan(self, query: str) -> List[Dict[str, Any]]:
-        cursor = self.connection.cursor(dictionary=True)
+    def measure_and_explain(self, query: str) -> Tuple[float, int, List[ExplainRow]]:
+        # A trailing semicolon (the README's own example ends with one)
+        # would leave an empty statement inside the multi-statement batch
+        # and fail with ER_EMPTY_QUERY.
+        query = query.strip().rstrip(';').rstrip()
+
+        cache_key = hashlib.blake2b(query.encode(), digest_size=16).digest()
+
+        prepared = self._prep_cache.get(cache_key)
+        if prepared is not None:
+            # Repeat analysis of the same query: reuse the server-side
+            # prepared statement so MySQL skips the parse step. EXPLAIN
+            # runs on its own cursor because the prepared protocol does
+            # not support multi-statement batches.
+            explain_cursor = self.connection.cursor()
+            explain_cursor.execute(f"EXPLAIN FORMAT=JSON {query}")
+            (blob,) = explain_cursor.fetchone()
+            explain_cursor.close()
+            explain_plan = list(_flatten_json_plan(_json_loads(blob)))
+
+            start_time = time.perf_counter()
+            prepared.execute(query)
+            row_count = sum(1 for _ in prepared)
+            end_time = time.perf_counter()
+
+            server_ms = self._server_execution_time_ms()
+            execution_time_ms = server_ms if server_ms is not None else (end_time - start_time) * 1000
+            return execution_time_ms, row_count, explain_plan
+
+        cursor = self.connection.cursor()
 
-        explain_query = f"EXPLAIN {query}"
-        cursor.execute(explain_query)
-        explain_results = cursor.fetchall()
+        # Send the EXPLAIN and the query itself in one multi-statement
+        # batch so the analysis costs a single network round trip instead
+        # of two. FORMAT=JSON returns the whole plan as one small blob —
+        # cheaper for the server to produce and for the client to decode
+        # than per-row dictionary tuples. The timed window still covers
+        # execute-to-drain of the real query.
+        batch = f"EXPLAIN FORMAT=JSON {query}; {query}"
+
+        # mysql-connector-python 9.2 dropped execute(..., multi=True);
+        # with the MULTI_STATEMENTS flag set, execute() runs the whole
+        # batch and nextset() advances to the query's result set.
+        start_time = time.perf_counter()
+        cursor.execute(batch)
+        (blob,) = cursor.fetchone()
+        explain_plan = list(_flatten_json_plan(_json_loads(blob)))
+        cursor.nextset()
+        row_count = sum(1 for _ in cursor)
+        end_time = time.perf_counter()
+
+        cursor.close()
+        # The last completed statement on this connection is the user
+        # query, so performance_schema reports its server-side cost.
+        server_ms = self._server_execution_time_ms()
+        execution_time_ms = server_ms if server_ms is not None else (end_time - start_time) * 1000
+        # The statement gets prepared on its next execution and reused
+        # from then on.
+        self._prep_cache[cache_key] = self.connection.cursor(prepared=True)
+        return execution_time_ms, row_count, explain_plan
+
+    def get_explain_plan(self, query: str) -> Iterator[ExplainRow]:
+        cursor = self.connection.cursor()
 
+        cursor.execute(f"EXPLAIN FORMAT=JSON {query}")
+        (blob,) = cursor.fetchone()
         cursor.close()
-        return explain_results
 
-    def analyze_performance(self, explain_plan: List[Dict[str, Any]]) -> Tuple[List[str], List[str]]:
-        problems = []
-        suggestions = []
+        yield from _flatten_json_plan(_json_loads(blob))
+
+    def analyze_performance(self, explain_plan: Iterable[ExplainRow]) -> List[Finding]:
+        if PANDAS_AVAILABLE:
+            return self._analyze_performance_vectorized(list(explain_plan))
+        return self._analyze_performance_loop(explain_plan)
+
+    def _analyze_performance_vectorized(self, explain_plan: List[ExplainRow]) -> List[Finding]:
+        findings: List[Finding] = []
+        seen: set = set()
 
-        for idx, row in enumerate(explain_plan):
+        if explain_plan:
+            df = pd.DataFrame(explain_plan)
+            for column, default in (('table', 'unknown'), ('type', ''), ('Extra', '')):
+                if column not in df:
+                    df[column] = default
+                df[column] = df[column].fillna(default)
+            for column in ('key', 'ref'):
+                if column not in df:
+                    df[column] = None
+            if 'rows' not in df:
+                df['rows'] = 0
+            rows_scanned = pd.to_numeric(df['rows'], errors='coerce').fillna(0).astype(int)
+            key_missing = df['key'].isna()
+
+            # Each check is a vectorized mask; the string scans over Extra
+            # run in C inside pandas rather than per-row in the
+            # interpreter. Findings come out grouped by check rather than
+            # by plan row.
+            checks = [
+                (Problem.FULL_SCAN, df['type'].eq('ALL')),
+                (Problem.NO_INDEX, key_missing & ~df['type'].isin(_NO_KEY_OK_TYPES)),
+                (Problem.FILESORT, df['Extra'].str.contains('Using filesort', regex=False)),
+                (Problem.TEMPORARY, df['Extra'].str.contains('Using temporary', regex=False)),
+                (Problem.WHERE_NO_INDEX, key_missing & df['Extra'].str.contains('Using where', regex=False)),
+            ]
+            for code, mask in checks:
+                for table in df.loc[mask, 'table']:
+                    _add_finding(findings, seen, code, table=table)
+
+            large = rows_scanned > 10000
+            for table, rows in zip(df.loc[large, 'table'], rows_scanned[large]):
+                _add_finding(findings, seen, Problem.LARGE_SCAN, table=table, rows=rows)
+
+            _check_join_order(list(zip(df['table'], rows_scanned, df['ref'])),
+                              findings, seen)
+
+        return findings
+
+    def _analyze_performance_loop(self, explain_plan: Iterable[ExplainRow]) -> List[Finding]:
+        findings: List[Finding] = []
+        seen: set = set()
+
+        join_info: List[Tuple[str, int, Any]] = []
+
+        for row in explain_plan:
+            # Pull every field exactly once per row; each .get re-hashes
+            # its key, so repeated fetches add up on wide plans.
             table_name = row.get('table', 'unknown')
-            select_type = row.get('select_type', '')
             type_value = row.get('type', '')
             key_value = row.get('key')
-            extra = row.get('Extra', '')
-            rows = row.get('rows', 0)
+            extra = row.get('Extra') or ''
+            rows_scanned = row.get('rows') or 0
+            join_info.append((table_name, rows_scanned, row.get('ref')))
 
             if type_value == 'ALL':
-                problems.append(f"Full Table Scan on table '{table_name}'")
-                suggestions.append(
-                    f"A full table scan was detected on table '{table_name}'. "
-                    f"Consider adding an index on the column(s) used in your WHERE or ON clauses."
-                )
+                _add_finding(findings, seen, Problem.FULL_SCAN, table=table_name)
 
-            if key_value is None and type_value not in ('ALL', 'index'):
-                problems.append(f"No index used for table '{table_name}'")
-                suggestions.append(
-                    f"The query did not use an index for table '{table_name}'. "
-                    f"Review your WHERE clause and consider adding an appropriate index."
-                )
+            if key_value is None and type_value not in _NO_KEY_OK_TYPES:
+                _add_finding(findings, seen, Problem.NO_INDEX, table=table_name)
 
-            if extra and 'Using filesort' in extra:
-                problems.append(f"Using filesort for table '{table_name}'")
-                suggestions.append(
-                    f"The query is using a filesort operation on table '{table_name}'. "
-                    f"Consider adding an index on the column(s) in your ORDER BY clause."
-                )
+            extra_tokens = {m.group(1) for m in _EXTRA_RE.finditer(extra)} if extra else ()
 
-            if extra and 'Using temporary' in extra:
-                problems.append(f"Using temporary table for '{table_name}'")
-                suggestions.append(
-                    f"The query is creating a temporary table for '{table_name}'. "
-                    f"This is often caused by GROUP BY or UNION. Review your query logic or "
-                    f"ensure columns in GROUP BY are indexed."
-                )
+            if 'filesort' in extra_tokens:
+                _add_finding(findings, seen, Problem.FILESORT, table=table_name)
 
-            if extra and 'Using where' in extra and key_value is None:
-                problems.append(f"Unindexed WHERE clause on table '{table_name}'")
-                suggestions.append(
-                    f"The WHERE clause on table '{table_name}' is not using an index. "
-                    f"This will significantly slow down the query. Add an index on the filtered columns."
-                )
+            if 'temporary' in extra_tokens:
+                _add_finding(findings, seen, Problem.TEMPORARY, table=table_name)
 
-            if rows and rows > 10000:
-                problems.append(f"Large number of rows scanned ({rows:,}) on table '{table_name}'")
-                suggestions.append(
-                    f"Table '{table_name}' is scanning {rows:,} rows. "
-                    f"This indicates a potential performance bottleneck. "
-                    f"Consider adding more selective indexes or refining your WHERE conditions."
-                )
+            if 'where' in extra_tokens and key_value is None:
+                _add_finding(findings, seen, Problem.WHERE_NO_INDEX, table=table_name)
 
-        if len(explain_plan) > 1:
-            first_table_rows = explain_plan[0].get('rows', 0)
-            if first_table_rows and first_table_rows > 1000:
-                problems.append("Potential suboptimal join order")
-                suggestions.append(
-                    f"The first table in the join order scans {first_table_rows:,} rows. "
-                    f"Consider reordering tables in your JOIN to start with the most selective table."
-                )
+            if rows_scanned > 10000:
+                _add_finding(findings, seen, Problem.LARGE_SCAN, table=table_name, rows=rows_scanned)
 
-        if not problems:
-            suggestions.append("No obvious performance issues detected. Query appears to be well-optimized.")
+        _check_join_order(join_info, findings, seen)
 
-        return problems, suggestions
+        return findings
 
     def format_rich_output(self, query: str, execution_time: float, row_count: int,
-                          explain_plan: List[Dict[str, Any]], problems: List[str],
-                          suggestions: List[str]):
-        self.console.print("\n")
-        self.console.print(Panel.fit(
+                          headers: List[str], plan_rows: List[Tuple[str, ...]],
+                          problems: List[str], suggestions: List[str]):
+        from rich.console import Console
+        from rich.table import Table
+        from rich.panel import Panel
+
+        # Render everything into an in-memory buffer and flush it with a
+        # single write; per-print terminal writes dominate wall time for
+        # fast queries. This path only runs on a terminal, hence
+        # force_terminal.
+        buf = io.StringIO()
+        console = Console(file=buf, force_terminal=True, width=Console().width)
+
+        console.print("\n")
+        console.print(Panel.fit(
             "[bold cyan]SQL Query Performance Analysis Report[/bold cyan]",
             border_style="cyan"
         ))
 
-        self.console.print("\n[bold yellow]Original Query:[/bold yellow]")
-        self.console.print(f"[dim]{query}[/dim]\n")
+        console.print("\n[bold yellow]Original Query:[/bold yellow]")
+        console.print(f"[dim]{query}[/dim]\n")
 
-        self.console.print(f"[bold green]Execution Time:[/bold green] {execution_time:.2f} ms")
-        self.console.print(f"[bold green]Rows Returned:[/bold green] {row_count:,}\n")
+        console.print(f"[bold green]Execution Time:[/bold green] {execution_time:.2f} ms")
+        console.print(f"[bold green]Rows Returned:[/bold green] {row_count:,}\n")
 
-        self.console.print("[bold yellow]EXPLAIN Plan:[/bold yellow]")
-        if explain_plan:
+        console.print("[bold yellow]EXPLAIN Plan:[/bold yellow]")
+        if plan_rows:
             table = Table(show_header=True, header_style="bold magenta")
 
-            headers = list(explain_plan[0].keys())
             for header in headers:
                 table.add_column(header, style="cyan")
 
-            for row in explain_plan:
-                table.add_row(*[str(row.get(h, '')) for h in headers])
+            for values in plan_rows:
+                table.add_row(*values)
 
-            self.console.print(table)
+            console.print(table)
 
-        self.console.print("\n[bold red]Problems Detected:[/bold red]")
+        console.print("\n[bold red]Problems Detected:[/bold red]")
         if problems:
             for problem in problems:
-                self.console.print(f"  [red]⚠[/red]  {problem}")
+                console.print(f"  [red]⚠[/red]  {problem}")
         else:
-            self.console.print("  [green]✓[/green] No issues found!")
+            console.print("  [green]✓[/green] No issues found!")
 
-        self.console.print("\n[bold blue]Optimization Suggestions:[/bold blue]")
+        console.print("\n[bold blue]Optimization Suggestions:[/bold blue]")
         for idx, suggestion in enumerate(suggestions, 1):
-            self.console.print(f"  [blue]{idx}.[/blue] {suggestion}")
-
-        self.console.print("\n")
-
-    def format_plain_output(self, query: str, execution_time: float, row_count: int,
-                           explain_plan: List[Dict[str, Any]], problems: List[str],
-                           suggestions: List[str]):
-        print("\n" + "="*80)
-        print("SQL QUERY PERFORMANCE ANALYSIS REPORT")
-        print("="*80)
+            console.print(f"  [blue]{idx}.[/blue] {suggestion}")
 
-        print("\nOriginal Query:")
-        print(f"  {query}\n")
+        console.print("\n")
 
-        print(f"Execution Time: {execution_time:.2f} ms")
-        print(f"Rows Returned: {row_count:,}\n")
+        sys.stdout.write(buf.getvalue())
 
-        print("EXPLAIN Plan:")
-        if explain_plan:
-            headers = list(explain_plan[0].keys())
-            col_widths = {h: max(len(h), max(len(str(row.get(h, ''))) for row in explain_plan))
-                         for h in headers}
-
-            header_line = " | ".join(h.ljust(col_widths[h]) for h in headers)
-            print(f"  {header_line}")
-            print("  " + "-" * len(header_line))
-
-            for row in explain_plan:
-                data_line = " | ".join(str(row.get(h, '')).ljust(col_widths[h]) for h in headers)
-                print(f"  {data_line}")
-
-        print("\nProblems Detected:")
+    def format_plain_output(self, query: str, execution_time: float, row_count: int,
+                           headers: List[str], plan_rows: List[Tuple[str, ...]],
+                           problems: List[str], suggestions: List[str]):
+        # Collect the report into one buffer and emit it with a single
+        # write; per-print writes to a line-buffered terminal add up.
+        out = []
+        out.append("\n" + "="*80)
+        out.append("SQL QUERY PERFORMANCE ANALYSIS REPORT")
+        out.append("="*80)
+
+        out.append("\nOriginal Query:")
+        out.append(f"  {query}\n")
+
+        out.append(f"Execution Time: {execution_time:.2f} ms")
+        out.append(f"Rows Returned: {row_count:,}\n")
+
+        out.append("EXPLAIN Plan:")
+        if plan_rows:
+            # Rows arrive pre-stringified from _shape_explain; one pass
+            # grows the column widths.
+            col_widths = [len(h) for h in headers]
+            for values in plan_rows:
+                for i, value in enumerate(values):
+                    if len(value) > col_widths[i]:
+                        col_widths[i] = len(value)
+
+            header_line = " | ".join(h.ljust(w) for h, w in zip(headers, col_widths))
+            out.append(f"  {header_line}")
+            out.append("  " + "-" * len(header_line))
+
+            for values in plan_rows:
+                data_line = " | ".join(v.ljust(w) for v, w in zip(values, col_widths))
+                out.append(f"  {data_line}")
+
+        out.append("\nProblems Detected:")
         if problems:
             for problem in problems:
-                print(f"  [WARNING] {problem}")
+                out.append(f"  [WARNING] {problem}")
         else:
-            print("  ✓ No issues found!")
+            out.append("  ✓ No issues found!")
 
-        print("\nOptimization Suggestions:")
+        out.append("\nOptimization Suggestions:")
         for idx, suggestion in enumerate(suggestions, 1):
-            print(f"  {idx}. {suggestion}")
+            out.append(f"  {idx}. {suggestion}")
 
-        print("\n" + "="*80 + "\n")
+        out.append("\n" + "="*80 + "\n")
+        sys.stdout.write("\n".join(out) + "\n")
 
     def analyze(self, query: str):
         try:
-            execution_time, row_count = self.measure_execution_time(query)
+            execution_time, row_count, explain_plan = self.measure_and_explain(query)
 
-            explain_plan = self.get_explain_plan(query)
+            findings = self.analyze_performance(explain_plan)
+            problems, suggestions = _render_findings(findings)
 
-            problems, suggestions = self.analyze_performance(explain_plan)
+            headers, plan_rows = _shape_explain(explain_plan)
 
-            if RICH_AVAILABLE:
+            if self._use_rich:
                 self.format_rich_output(query, execution_time, row_count,
-                                       explain_plan, problems, suggestions)
+                                       headers, plan_rows, problems, suggestions)
             else:
                 self.format_plain_output(query, execution_time, row_count,
-                                        explain_plan, problems, suggestions)
+                                        headers, plan_rows, problems, suggestions)
 
         except Error as e:
             print(f"Error during analysis: {e}")